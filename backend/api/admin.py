@@ -13,11 +13,10 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'count_favorites')
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count')
     list_filter = ('author', 'name', 'tags')
-
-    def count_favorites(self, obj):
-        return obj.favorites.count()
+    list_select_related = ('author',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
 
 
 admin.site.register(Tag, TagAdmin)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        import api.signals  # noqa: F401
+        from api.services import register_fonts
+        register_fonts()
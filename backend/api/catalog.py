@@ -0,0 +1,78 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+
+from api.models import TRIGRAM_MIN_LENGTH, Ingredient
+from api.versions import bump_version, get_version
+
+CATALOG_VERSION_KEY = 'ingredient_catalog_version'
+
+
+def bump_catalog_version():
+    bump_version(CATALOG_VERSION_KEY)
+
+
+class IngredientCatalog:
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.loaded_at = None
+        self.names = []
+        self.ingredients = []
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, version):
+        ingredients = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (item['name'].lower(), item['name']),
+        )
+        self.names = [item['name'].lower() for item in ingredients]
+        self.ingredients = ingredients
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def is_fresh(self, version):
+        return (self.version == version
+                and time.monotonic() - self.loaded_at
+                < settings.INGREDIENT_CATALOG_MAX_AGE)
+
+    def get(self):
+        version = get_version(CATALOG_VERSION_KEY)
+        if self.is_fresh(version):
+            self.hits += 1
+            return self.names, self.ingredients
+        with self.lock:
+            if not self.is_fresh(version):
+                self.misses += 1
+                self.load(version)
+            return self.names, self.ingredients
+
+    def search(self, name):
+        name = name.lower()
+        names, ingredients = self.get()
+        start = bisect_left(names, name)
+        end = start
+        while end < len(names) and names[end].startswith(name):
+            end += 1
+        result = ingredients[start:end]
+        if len(name) >= TRIGRAM_MIN_LENGTH:
+            result += [
+                ingredient
+                for lower_name, ingredient in zip(names, ingredients)
+                if name in lower_name and not lower_name.startswith(name)
+            ]
+        return result
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'size': len(self.ingredients),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+ingredient_catalog = IngredientCatalog()
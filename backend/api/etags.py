@@ -0,0 +1,36 @@
+from hashlib import md5
+
+from api.catalog import CATALOG_VERSION_KEY
+from api.models import Recipe
+from api.pagination import USER_COUNT_VERSION_KEY
+from api.versions import get_version, get_versions
+
+
+def make_etag(request, *parts):
+    parts = (request.META.get('HTTP_ACCEPT', ''), *parts)
+    return md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def catalog_etag(request, *args, **kwargs):
+    version = get_version(CATALOG_VERSION_KEY)
+    return make_etag(request, request.get_full_path(), version)
+
+
+def recipe_etag(request, pk=None, **kwargs):
+    recipe = Recipe.objects.filter(pk=pk).values_list(
+        'updated_at', 'author__username', 'author__first_name',
+        'author__last_name', 'author__email').first()
+    if recipe is None:
+        return None
+    keys = [CATALOG_VERSION_KEY]
+    if request.user.is_authenticated:
+        keys.append(USER_COUNT_VERSION_KEY.format(request.user.pk))
+    return make_etag(request, pk, *recipe, request.user.pk,
+                     *get_versions(keys))
+
+
+def recipe_last_modified(request, pk=None, **kwargs):
+    if request.user.is_authenticated:
+        return None
+    return Recipe.objects.filter(pk=pk).values_list(
+        'updated_at', flat=True).first()
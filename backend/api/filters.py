@@ -1,33 +1,75 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from api.models import Recipe
+from api.models import Recipe, Tag
 
 User = get_user_model()
 
+TAG_SLUGS_KEY = 'tag_slugs'
 
-class IngredientSearchFilter(SearchFilter):
+
+def get_tag_ids():
+    return cache.get_or_set(
+        TAG_SLUGS_KEY,
+        lambda: dict(Tag.objects.values_list('slug', 'id')),
+        settings.TAG_SLUGS_CACHE_TIMEOUT,
+    )
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in sorted(get_tag_ids())]
+
+
+class IngredientSearchFilter(BaseFilterBackend):
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return queryset
+        return queryset.search(name)
+
+
+ORDERING_CHOICES = (
+    ('-favorites_count', 'Популярные в избранном'),
+    ('-in_carts_count', 'Популярные в корзинах'),
+)
+
 
 class AuthorAndTagFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(choices=get_tag_choices,
+                                        method='filter_tags')
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    ordering = filters.ChoiceFilter(choices=ORDERING_CHOICES,
+                                    method='filter_ordering')
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in value],
+        )))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(value, '-id')
+
     class Meta:
         model = Recipe
         fields = ('tags', 'author')
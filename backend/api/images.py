@@ -0,0 +1,127 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from hashlib import sha1
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from api.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+
+class SyncBackend:
+    def submit(self, func, *args):
+        func(*args)
+
+
+class ThreadPoolBackend:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='images',
+        )
+
+    def submit(self, func, *args):
+        self.executor.submit(self.run, func, *args)
+
+    def run(self, func, *args):
+        try:
+            func(*args)
+        finally:
+            connections.close_all()
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.IMAGE_PROCESSING_BACKEND)()
+
+
+def variant_name(name, variant):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}_{variant}.webp')
+
+
+def load_image(f):
+    image = Image.open(f)
+    image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    return image
+
+
+def resize(image, size):
+    image = image.copy()
+    image.thumbnail(size)
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=settings.IMAGE_VARIANT_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def save(name, content):
+    default_storage.delete(name)
+    return default_storage.save(name, content)
+
+
+def make_variants(name):
+    with default_storage.open(name) as f:
+        image = load_image(f)
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        save(variant_name(name, variant), resize(image, size))
+
+
+def thumbnail_name(digest):
+    return os.path.join('thumbnails', digest[:2], f'{digest}.webp')
+
+
+def make_thumbnail(name):
+    with default_storage.open(name) as f:
+        content = f.read()
+    digest = sha1(content).hexdigest()
+    thumbnail = thumbnail_name(digest)
+    if not default_storage.exists(thumbnail):
+        image = load_image(BytesIO(content))
+        save(thumbnail, resize(image, settings.RECIPE_THUMBNAIL_SIZE))
+    return digest
+
+
+def thumbnail_url(image_name, image_hash):
+    return default_storage.url(
+        thumbnail_name(image_hash) if image_hash else image_name)
+
+
+def mark_processed(name, digest):
+    Recipe.objects.filter(image=name).update(
+        image_variants_ready=True, image_hash=digest,
+        updated_at=timezone.now())
+
+
+def process_image(name):
+    try:
+        make_variants(name)
+        mark_processed(name, make_thumbnail(name))
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def schedule_variants(name):
+    transaction.on_commit(lambda: get_backend().submit(process_image, name))
+
+
+def variant_urls(image_name, ready, request=None):
+    urls = {}
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        url = default_storage.url(
+            variant_name(image_name, variant) if ready else image_name)
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,39 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'benchmark of OFFSET/LIMIT vs cursor pagination of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', nargs='+', type=int,
+                            default=[1, 1000])
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, label, run, repeat):
+        timings = timeit.repeat(run, repeat=repeat, number=1)
+        self.stdout.write(f'{label:>24}: '
+                          f'min {min(timings) * 1000:.1f} мс, '
+                          f'max {max(timings) * 1000:.1f} мс')
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.order_by('-id')
+        limit = options['limit']
+        repeat = options['repeat']
+        self.stdout.write(f'Рецептов: {queryset.count()}')
+        self.measure('COUNT(*)', lambda: queryset.count(), repeat)
+        for page in options['pages']:
+            offset = (page - 1) * limit
+            pivot = queryset.values_list('id', flat=True)[offset:offset + 1]
+            position = pivot[0] + 1 if pivot else 0
+            self.measure(
+                f'страница {page}, offset',
+                lambda: list(queryset[offset:offset + limit]), repeat)
+            self.measure(
+                f'страница {page}, cursor',
+                lambda: list(queryset.filter(id__lt=position)[:limit + 1]),
+                repeat)
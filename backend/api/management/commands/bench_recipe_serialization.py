@@ -0,0 +1,43 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Recipe
+from api.renderers import FastJSONRenderer, orjson
+from api.services import build_recipe_cards, serialize_recipe_cards
+
+
+class Command(BaseCommand):
+    help = 'benchmark values() recipe cards and the fast json renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, label, run, repeat):
+        timings = timeit.repeat(run, repeat=repeat, number=1)
+        self.stdout.write(f'{label:>32}: '
+                          f'min {min(timings) * 1000:.1f} мс, '
+                          f'max {max(timings) * 1000:.1f} мс')
+
+    def handle(self, *args, **options):
+        pks = list(Recipe.objects.values_list(
+            'id', flat=True)[:options['recipes']])
+        if not pks:
+            raise CommandError('Нет рецептов, сначала запустите seed_data')
+        if orjson is None:
+            self.stderr.write('orjson не установлен, FastJSONRenderer '
+                              'использует стандартный json')
+        request = RequestFactory().get('/api/recipes/')
+        page = list(serialize_recipe_cards(pks, request).values())
+        repeat = options['repeat']
+        self.measure('ReadRecipeSerializer',
+                     lambda: serialize_recipe_cards(pks, request), repeat)
+        self.measure('values()',
+                     lambda: build_recipe_cards(pks, request), repeat)
+        self.measure('JSONRenderer',
+                     lambda: JSONRenderer().render(page), repeat)
+        self.measure('FastJSONRenderer',
+                     lambda: FastJSONRenderer().render(page), repeat)
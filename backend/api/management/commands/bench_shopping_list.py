@@ -0,0 +1,51 @@
+import timeit
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.services import SHOPPING_LIST_STREAMS, render_shopping_list
+
+FORMATS = ('pdf', *SHOPPING_LIST_STREAMS)
+
+
+def export(ingredients, file_format):
+    if file_format == 'pdf':
+        return len(render_shopping_list(ingredients).getvalue())
+    return sum(len(chunk.encode())
+               for chunk in SHOPPING_LIST_STREAMS[file_format](ingredients))
+
+
+class Command(BaseCommand):
+    help = 'benchmark of shopping list export formats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int,
+                            default=[10, 100, 1000])
+        parser.add_argument('--formats', nargs='+', choices=FORMATS,
+                            default=FORMATS)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            ingredients = [
+                {
+                    'ingredient__name': f'Ингредиент {i}',
+                    'ingredient__measurement_unit': 'г',
+                    'amount': i,
+                }
+                for i in range(1, size + 1)
+            ]
+            for file_format in options['formats']:
+                timings = timeit.repeat(
+                    lambda: export(ingredients, file_format),
+                    repeat=options['repeat'], number=1)
+                tracemalloc.start()
+                file_size = export(ingredients, file_format)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.stdout.write(
+                    f'{size:>6} ингредиентов, {file_format:>4}: '
+                    f'min {min(timings) * 1000:.1f} мс, '
+                    f'max {max(timings) * 1000:.1f} мс, '
+                    f'пик памяти {peak / 1024:.0f} КБ, '
+                    f'{file_size} байт')
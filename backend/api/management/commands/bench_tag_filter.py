@@ -0,0 +1,43 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from api.filters import get_tag_ids
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'benchmark of recipe filtering by tags: join + DISTINCT vs EXISTS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tags', nargs='*', type=str)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--explain', action='store_true')
+
+    def handle(self, *args, **options):
+        tag_ids = get_tag_ids()
+        slugs = options['tags'] or list(tag_ids)
+        queries = {
+            'distinct': Recipe.objects.filter(
+                tags__slug__in=slugs).distinct(),
+            'exists': Recipe.objects.filter(Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag_id__in=[tag_ids[slug] for slug in slugs],
+                ))),
+        }
+        self.stdout.write(f'Теги: {", ".join(slugs)}')
+        for label, queryset in queries.items():
+            page = queryset[:options['limit']]
+            for name, run in (('count', lambda: queryset.all().count()),
+                              ('page', lambda: list(page.all()))):
+                timings = timeit.repeat(run, repeat=options['repeat'],
+                                        number=1)
+                self.stdout.write(
+                    f'{label:>8} {name:>5}: '
+                    f'min {min(timings) * 1000:.1f} мс, '
+                    f'max {max(timings) * 1000:.1f} мс')
+            if options['explain']:
+                self.stdout.write(page.explain())
@@ -0,0 +1,104 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Recipe
+from api.services import invalidate_shopping_lists
+
+User = get_user_model()
+
+WATCHED_TABLES = (
+    'api_recipe',
+    'api_recipe_tags',
+    'api_ingredientamount',
+    'api_favorite',
+    'api_cart',
+    'users_follow',
+)
+
+
+def seq_scans(plan, tables):
+    if (plan.get('Node Type') == 'Seq Scan'
+            and plan.get('Relation Name') in tables
+            and 'Filter' in plan):
+        yield plan['Relation Name'], plan['Filter']
+    for child in plan.get('Plans', ()):
+        yield from seq_scans(child, tables)
+
+
+class Command(BaseCommand):
+    help = ('fails if queries of the hot endpoints filter watched tables '
+            'with sequential scans')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int)
+        parser.add_argument('--analyze', action='store_true',
+                            help='run ANALYZE before checking')
+
+    def get_endpoints(self, user):
+        recipe = Recipe.objects.filter(author=user).first() or (
+            Recipe.objects.first())
+        return [
+            '/api/recipes/',
+            f'/api/recipes/?author={user.id}',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            f'/api/recipes/{recipe.id}/',
+            '/api/users/subscriptions/?recipes_limit=3',
+            '/api/recipes/download_shopping_cart/?format=json',
+        ]
+
+    def explain(self, queries):
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {query["sql"]}')
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plans.append((query['sql'], plan[0]['Plan']))
+        return plans
+
+    def check_url(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = b''.join(client.get(url))
+        plans = self.explain(context.captured_queries)
+        failures = [
+            f'{url}: Seq Scan on {table} ({condition})\n    {sql}'
+            for sql, plan in plans
+            for table, condition in seq_scans(plan, WATCHED_TABLES)
+        ]
+        self.stdout.write(f'{url}: {len(plans)} запросов, '
+                          f'{len(response)} байт')
+        return failures
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов доступна только для '
+                               'PostgreSQL')
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        if options['user']:
+            user = User.objects.get(id=options['user'])
+        else:
+            user = User.objects.annotate(
+                favorites_count=Count('favorite')
+            ).order_by('-favorites_count').first()
+        if user is None or not Recipe.objects.exists():
+            raise CommandError('База данных пуста, сначала заполните её')
+        invalidate_shopping_lists([user.id])
+        client = APIClient()
+        client.force_authenticate(user)
+        failures = []
+        for url in self.get_endpoints(user):
+            failures += self.check_url(client, url)
+        if failures:
+            raise CommandError('Последовательное сканирование:\n'
+                               + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке'))
@@ -1,36 +1,143 @@
+import csv
+import io
 import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db.utils import IntegrityError
+from django.db import connection, transaction
 
+from api.catalog import bump_catalog_version
 from api.models import Ingredient
 
-DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+DATA_DIRS = (
+    os.path.join(settings.BASE_DIR, 'data'),
+    os.path.join(os.path.dirname(settings.BASE_DIR), 'data'),
+)
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = ' \t\r\n,'
+
+
+def find_data_file(filename):
+    for path in (filename, *(os.path.join(root, filename)
+                             for root in DATA_DIRS)):
+        if os.path.isfile(path):
+            return path
+    raise CommandError(f'Файл {filename} отсутствует в директории data')
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f'Некорректная строка {reader.line_num}: ожидаются '
+                f'название и единица измерения')
+        yield row[0], row[1]
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Файл должен содержать JSON-массив')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip(SEPARATORS)
+        if buffer.startswith(']'):
+            return
+        try:
+            ingredient, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON в файле')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        try:
+            row = ingredient['name'], ingredient['measurement_unit']
+        except (KeyError, TypeError):
+            raise CommandError(f'Некорректный ингредиент: {ingredient}')
+        yield row
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def batches(rows, size):
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Command(BaseCommand):
-    help = 'loading ingredients from data in json'
+    help = 'loading ingredients from data in json or csv'
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.json', nargs='?',
                             type=str)
+        parser.add_argument('--batch-size', default=1000, type=int)
+        parser.add_argument('--copy', action='store_true',
+                            help='use COPY on PostgreSQL')
 
     def handle(self, *args, **options):
-        try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as f:
-                data = json.load(f)
-                for ingredient in data:
-                    try:
-                        Ingredient.objects.create(name=ingredient["name"],
-                                                  measurement_unit=ingredient[
-                                                      "measurement_unit"])
-                    except IntegrityError:
-                        print(f'Ингридиет {ingredient["name"]} '
-                              f'{ingredient["measurement_unit"]} '
-                              f'уже есть в базе')
-
-        except FileNotFoundError:
-            raise CommandError('Файл отсутствует в директории data')
+        path = find_data_file(options['filename'])
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы json и csv')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('COPY доступен только для PostgreSQL')
+        load = self.copy if options['copy'] else self.bulk_create
+        start = time.monotonic()
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            total, inserted = load(reader(f), options['batch_size'])
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, пропущено: {total - inserted}, '
+            f'время: {time.monotonic() - start:.2f} с'))
+
+    def bulk_create(self, rows, batch_size):
+        total = 0
+        before = Ingredient.objects.count()
+        for batch in batches(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in batch],
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+        return total, Ingredient.objects.count() - before
+
+    @transaction.atomic
+    def copy(self, rows, batch_size):
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP')
+            for batch in batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv, '
+                    'FORCE_NOT_NULL (name, measurement_unit))', buffer)
+                total += len(batch)
+            cursor.execute(
+                f'INSERT INTO {Ingredient._meta.db_table} '
+                '(name, measurement_unit) '
+                'SELECT name, measurement_unit FROM ingredient_import '
+                'ON CONFLICT DO NOTHING')
+            return total, cursor.rowcount
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.images import make_thumbnail, make_variants, mark_processed
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'generate resized webp variants of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='regenerate existing variants')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        processed = failed = 0
+        recipes = Recipe.objects.exclude(image='')
+        if not options['force']:
+            recipes = recipes.filter(image_variants_ready=False)
+        names = recipes.order_by('image').values_list(
+            'image', flat=True).distinct()
+        for name in names.iterator():
+            try:
+                make_variants(name)
+                mark_processed(name, make_thumbnail(name))
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано: {processed}, ошибок: {failed}, '
+            f'время: {time.monotonic() - start:.2f} с'))
@@ -0,0 +1,196 @@
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from api.catalog import bump_catalog_version
+from api.middleware import RequestMetrics
+from api.models import Cart, Ingredient, Recipe, Tag
+from api.pagination import LimitPageNumberPagination
+from api.services import invalidate_shopping_lists
+from users.models import Follow
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = 'benchmark api endpoints with the in-process test client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--scenarios', nargs='+',
+                            help='run only these scenarios')
+        parser.add_argument('--user', type=int,
+                            help='id of the authenticated user')
+        parser.add_argument('--output', help='write results to json file')
+        parser.add_argument('--compare', help='json file of a previous run')
+        parser.add_argument('--clear-cache', action='store_true')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['clear_cache']:
+            cache.clear()
+        self.random = random.Random(options['seed'])
+        user_id = options['user'] or self.get_busiest_user()
+        token, _ = Token.objects.get_or_create(user_id=user_id)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        self.client = Client()
+        scenarios = self.get_scenarios(user_id)
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - scenarios.keys()
+            if unknown:
+                raise CommandError(f'Неизвестные сценарии: {sorted(unknown)}')
+            scenarios = {name: scenarios[name]
+                         for name in options['scenarios']}
+        results = {}
+        for name, (urls, auth, prepare) in scenarios.items():
+            results[name] = self.measure(
+                urls, auth, prepare, options['iterations'],
+                options['warmup'])
+            self.report(name, results[name])
+        run = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'user': user_id,
+            'iterations': options['iterations'],
+            'dataset': {
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+                'follows': Follow.objects.count(),
+                'carts': Cart.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(run, f, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def get_busiest_user(self):
+        user = Cart.objects.values('user').annotate(
+            total=Count('id')).order_by('-total').first()
+        if user is None:
+            raise CommandError('Нет данных, сначала запустите seed_data')
+        return user['user']
+
+    def get_scenarios(self, user_id):
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True)[:1000])
+        if not recipe_ids:
+            raise CommandError('Нет рецептов, сначала запустите seed_data')
+        last_page = math.ceil(
+            Recipe.objects.count() / LimitPageNumberPagination.page_size)
+        author_id = Recipe.objects.values('author').annotate(
+            total=Count('id')).order_by('-total').first()['author']
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        names = list(Ingredient.objects.values_list('name', flat=True)[:200])
+        tags = '&'.join(f'tags={slug}' for slug in slugs)
+        search = [f'/api/ingredients/?name={name[:3]}' for name in names]
+        txt = ['/api/recipes/download_shopping_cart/?format=txt']
+        pdf = ['/api/recipes/download_shopping_cart/?format=pdf']
+
+        def clear_shopping_list():
+            invalidate_shopping_lists([user_id])
+
+        return {
+            'recipe_list': (['/api/recipes/'], False, None),
+            'recipe_list_auth': (['/api/recipes/'], True, None),
+            'recipe_list_limit_50': (['/api/recipes/?limit=50'], True, None),
+            'recipe_list_deep_page': (
+                [f'/api/recipes/?page={last_page}'], True, None),
+            'recipe_detail': (
+                [f'/api/recipes/{pk}/' for pk in recipe_ids], True, None),
+            'filter_tags': ([f'/api/recipes/?{tags}'], True, None),
+            'filter_author': (
+                [f'/api/recipes/?author={author_id}'], True, None),
+            'filter_favorited': (
+                ['/api/recipes/?is_favorited=1'], True, None),
+            'filter_in_cart': (
+                ['/api/recipes/?is_in_shopping_cart=1'], True, None),
+            'ordering_popular': (
+                ['/api/recipes/?ordering=-favorites_count'], True, None),
+            'subscriptions': (
+                ['/api/users/subscriptions/?recipes_limit=3'], True, None),
+            'ingredient_search': (search, False, None),
+            'ingredient_search_cold': (search, False, bump_catalog_version),
+            'shopping_cart_txt': (txt, True, None),
+            'shopping_cart_txt_cold': (txt, True, clear_shopping_list),
+            'shopping_cart_pdf': (pdf, True, None),
+            'shopping_cart_pdf_cold': (pdf, True, clear_shopping_list),
+        }
+
+    def request(self, url, auth):
+        metrics = RequestMetrics()
+        start = time.perf_counter()
+        with connection.execute_wrapper(metrics):
+            response = self.client.get(url, **(self.auth if auth else {}))
+            size = len(b''.join(response.streaming_content)
+                       if response.streaming else response.content)
+        return (time.perf_counter() - start, metrics.queries, size,
+                response.status_code)
+
+    def measure(self, urls, auth, prepare, iterations, warmup):
+        for _ in range(warmup):
+            self.request(self.random.choice(urls), auth)
+        timings = []
+        queries = []
+        sizes = []
+        statuses = set()
+        for _ in range(iterations):
+            if prepare is not None:
+                prepare()
+            elapsed, count, size, status = self.request(
+                self.random.choice(urls), auth)
+            timings.append(elapsed * 1000)
+            queries.append(count)
+            sizes.append(size)
+            statuses.add(status)
+        return {
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p90_ms': round(percentile(timings, 90), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+            'bytes_mean': round(sum(sizes) / len(sizes)),
+            'statuses': sorted(statuses),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:>24}: p50 {result["p50_ms"]:.1f} мс, '
+            f'p90 {result["p90_ms"]:.1f} мс, p99 {result["p99_ms"]:.1f} мс, '
+            f'запросов {result["queries_min"]}-{result["queries_max"]}, '
+            f'{result["bytes_mean"]} байт, статусы {result["statuses"]}')
+        if any(status >= 400 for status in result['statuses']):
+            self.stderr.write(self.style.WARNING(
+                f'{name}: ошибочные статусы {result["statuses"]}'))
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)['results']
+        self.stdout.write(f'Сравнение с {path}:')
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            before = previous[name]
+            self.stdout.write(
+                f'{name:>24}: p50 {before["p50_ms"]:.1f} -> '
+                f'{result["p50_ms"]:.1f} мс '
+                f'({result["p50_ms"] / before["p50_ms"]:.2f}x), '
+                f'запросов {before["queries_max"]} -> '
+                f'{result["queries_max"]}')
@@ -0,0 +1,164 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.catalog import bump_catalog_version
+from api.management.commands.load_ingredients import (find_data_file,
+                                                      read_json)
+from api.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                        Recipe, Tag)
+from api.pagination import bump_count_version
+from users.models import Follow
+
+User = get_user_model()
+
+TAGS = (
+    ('Завтрак', 'breakfast', Tag.ORANGE),
+    ('Обед', 'lunch', Tag.GREEN),
+    ('Ужин', 'dinner', Tag.PURPLE),
+    ('Десерт', 'dessert', Tag.YELLOW),
+    ('Перекус', 'snack', Tag.BLUE),
+)
+
+
+def power_law_weights(size, alpha):
+    return [1 / rank ** alpha for rank in range(1, size + 1)]
+
+
+class Command(BaseCommand):
+    help = 'seed a synthetic dataset with power-law recipes per author'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='power-law exponent of recipes per author')
+        parser.add_argument('--follows', type=int, default=20,
+                            help='follows per user')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='favorites per user')
+        parser.add_argument('--carts', type=int, default=10,
+                            help='shopping cart recipes per user')
+        parser.add_argument('--tags', type=int, default=len(TAGS),
+                            help=f'number of tags, at most {len(TAGS)}')
+        parser.add_argument('--ingredients', default='ingredients.json')
+        parser.add_argument('--image', default='recipes/00_06.jpg')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.monotonic()
+        with transaction.atomic():
+            ingredient_ids = self.seed_ingredients(options['ingredients'])
+            tag_ids = self.seed_tags(options['tags'])
+            user_ids = self.seed_users(options['users'], options['seed'])
+            weights = power_law_weights(len(user_ids), options['alpha'])
+            recipe_ids = self.seed_recipes(
+                options['recipes'], user_ids, weights, options['image'])
+            self.seed_recipe_relations(recipe_ids, tag_ids, ingredient_ids)
+            self.seed_user_relations(
+                user_ids, weights, recipe_ids, options)
+            call_command('recount_recipes', stdout=self.stdout)
+        bump_count_version()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, рецептов: {len(recipe_ids)}, '
+            f'время: {time.monotonic() - start:.2f} с'))
+
+    def seed_ingredients(self, filename):
+        with open(find_data_file(filename), 'r', encoding='utf-8') as f:
+            rows = list(read_json(f))
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in rows],
+            batch_size=self.batch_size, ignore_conflicts=True)
+        return list(Ingredient.objects.filter(
+            name__in=[name for name, _ in rows]).values_list('id', flat=True))
+
+    def seed_tags(self, count):
+        if not 1 <= count <= len(TAGS):
+            raise CommandError(f'Количество тегов должно быть от 1 '
+                               f'до {len(TAGS)}')
+        tags = TAGS[:count]
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slug, color=color)
+             for name, slug, color in tags],
+            ignore_conflicts=True)
+        return list(Tag.objects.filter(
+            slug__in=[slug for _, slug, _ in tags]).values_list(
+                'id', flat=True))
+
+    def seed_users(self, count, seed):
+        password = make_password('seed-password')
+        prefix = f'seed{seed}_'
+        User.objects.bulk_create(
+            [User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com',
+                  first_name='Пользователь', last_name=str(i),
+                  password=password)
+             for i in range(count)],
+            batch_size=self.batch_size, ignore_conflicts=True)
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix).values_list('id', flat=True))
+        self.random.shuffle(user_ids)
+        return user_ids
+
+    def seed_recipes(self, count, user_ids, weights, image):
+        authors = self.random.choices(user_ids, weights, k=count)
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(author_id=author_id, name=f'Рецепт {i}', image=image,
+                    text='Описание рецепта',
+                    cooking_time=self.random.randint(5, 180))
+             for i, author_id in enumerate(authors)],
+            batch_size=self.batch_size)
+        if recipes and recipes[0].pk is None:
+            return list(Recipe.objects.order_by('-id').values_list(
+                'id', flat=True)[:count])
+        return [recipe.pk for recipe in recipes]
+
+    def seed_recipe_relations(self, recipe_ids, tag_ids, ingredient_ids):
+        if len(ingredient_ids) < 15:
+            raise CommandError('Нужно хотя бы 15 ингредиентов')
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.bulk_create(
+            [RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+             for recipe_id in recipe_ids
+             for tag_id in self.random.sample(
+                 tag_ids, self.random.randint(1, len(tag_ids)))],
+            batch_size=self.batch_size)
+        IngredientAmount.objects.bulk_create(
+            [IngredientAmount(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                              amount=self.random.randint(1, 500))
+             for recipe_id in recipe_ids
+             for ingredient_id in self.random.sample(
+                 ingredient_ids, self.random.randint(5, 15))],
+            batch_size=self.batch_size)
+
+    def seed_user_relations(self, user_ids, weights, recipe_ids, options):
+        follows = []
+        favorites = []
+        carts = []
+        for user_id in user_ids:
+            authors = set(self.random.choices(
+                user_ids, weights, k=options['follows']))
+            authors.discard(user_id)
+            follows += [Follow(user_id=user_id, author_id=author_id)
+                        for author_id in authors]
+            favorites += [
+                Favorite(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in self.random.sample(
+                    recipe_ids, min(options['favorites'], len(recipe_ids)))]
+            carts += [
+                Cart(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in self.random.sample(
+                    recipe_ids, min(options['carts'], len(recipe_ids)))]
+        for model, objects in ((Follow, follows), (Favorite, favorites),
+                               (Cart, carts)):
+            model.objects.bulk_create(objects, batch_size=self.batch_size,
+                                      ignore_conflicts=True)
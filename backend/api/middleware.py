@@ -0,0 +1,94 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('api.metrics')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_start = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def rendered(self, response):
+        self.render_time = time.perf_counter() - self.render_start
+
+
+def get_view_name(request):
+    match = request.resolver_match
+    if match is None:
+        return None, None
+    view = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if view is None:
+        return match.view_name, None
+    return f'{view.__name__}.{action}' if action else view.__name__, (
+        getattr(view, 'query_budgets', {}).get(action))
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        start = time.perf_counter()
+        with connection.execute_wrapper(metrics):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        app_time = total - metrics.db_time - metrics.render_time
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'app;dur={app_time * 1000:.1f}',
+            f'render;dur={metrics.render_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        view, budget = get_view_name(request)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'app_ms': round(app_time * 1000, 1),
+            'render_ms': round(metrics.render_time * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'size': (None if response.streaming
+                     else len(response.content)),
+            'budget': budget,
+        }
+        if budget is not None and metrics.queries > budget:
+            logger.warning(json.dumps(record))
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(
+                    f'{view}: {metrics.queries} запросов к БД '
+                    f'при лимите {budget}')
+        else:
+            logger.info(json.dumps(record))
+        return response
+
+    def process_template_response(self, request, response):
+        request.metrics.render_start = time.perf_counter()
+        response.add_post_render_callback(request.metrics.rendered)
+        return response
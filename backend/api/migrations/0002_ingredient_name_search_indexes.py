@@ -0,0 +1,39 @@
+from django.db import migrations
+
+PREFIX_INDEX = 'api_ingredient_lower_name_prefix'
+TRIGRAM_INDEX = 'api_ingredient_lower_name_trgm'
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} '
+        f'ON api_ingredient (LOWER(name) text_pattern_ops)')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} '
+        f'ON api_ingredient USING gin (LOWER(name) gin_trgm_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+    schema_editor.execute(f'DROP INDEX IF EXISTS {PREFIX_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_ingredient_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['user', '-id'], name='cart_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-id'], name='favorite_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientamount',
+            index=models.Index(fields=['recipe', 'ingredient'], name='ingredientamount_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipe_author_id_idx'),
+        ),
+    ]
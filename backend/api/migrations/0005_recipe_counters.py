@@ -0,0 +1,50 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:22
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(total=Count('id')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_subquery(apps.get_model('api', 'Favorite')),
+        in_carts_count=count_subquery(apps.get_model('api', 'Cart')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В корзинах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_ready',
+            field=models.BooleanField(default=False, verbose_name='Варианты изображения готовы'),
+        ),
+    ]
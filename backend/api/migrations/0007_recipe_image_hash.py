@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_recipe_image_variants_ready'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_hash',
+            field=models.CharField(blank=True, max_length=40, verbose_name='Хеш изображения'),
+        ),
+    ]
@@ -1,9 +1,32 @@
 from django.contrib.auth import get_user_model
 from django.core import validators
 from django.db import models
+from django.db.models import (Case, Exists, F, OuterRef, Prefetch, Value,
+                              When, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower, RowNumber
+
+from users.models import Follow
 
 User = get_user_model()
 
+TRIGRAM_MIN_LENGTH = 3
+
+
+class IngredientQuerySet(models.QuerySet):
+    def search(self, name):
+        name = name.lower()
+        queryset = self.annotate(lower_name=Lower('name'))
+        if len(name) < TRIGRAM_MIN_LENGTH:
+            return queryset.filter(
+                lower_name__startswith=name).order_by('name')
+        return queryset.filter(lower_name__contains=name).annotate(
+            rank=Case(
+                When(lower_name__startswith=name, then=Value(0)),
+                default=Value(1),
+            )
+        ).order_by('rank', 'name')
+
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=200,
@@ -11,6 +34,8 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(max_length=200,
                                         verbose_name='Единица измерения')
 
+    objects = IngredientQuerySet.as_manager()
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'Ингредиент'
@@ -54,6 +79,48 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()),
+                author_is_subscribed=Value(
+                    False, output_field=models.BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(Cart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+    def limit_per_author(self, limit):
+        ranked = self.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author'),
+            order_by=F('id').desc(),
+        )).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE row_number <= %s',
+            (*params, limit),
+        ))
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientamount_set',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'),
+            ),
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='recipes',
@@ -78,11 +145,29 @@ class Recipe(models.Model):
             validators.MinValueValidator(
                 1, message='Минимальное время приготовления 1 минута'),),
         verbose_name='Время приготовления')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+    favorites_count = models.PositiveIntegerField(
+        default=0, verbose_name='В избранном')
+    in_carts_count = models.PositiveIntegerField(
+        default=0, verbose_name='В корзинах')
+    image_variants_ready = models.BooleanField(
+        default=False, verbose_name='Варианты изображения готовы')
+    image_hash = models.CharField(max_length=40, blank=True,
+                                  verbose_name='Хеш изображения')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='recipe_author_id_idx'),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_favorites_count_idx'),
+        ]
 
 
 class IngredientAmount(models.Model):
@@ -108,6 +193,10 @@ class IngredientAmount(models.Model):
         ordering = ['-id']
         verbose_name = 'Количество ингридиента'
         verbose_name_plural = 'Количество ингридиентов'
+        indexes = [
+            models.Index(fields=['recipe', 'ingredient'],
+                         name='ingredientamount_recipe_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(fields=['ingredient', 'recipe'],
                                     name='unique ingredients recipe')
@@ -131,6 +220,9 @@ class Favorite(models.Model):
         ordering = ['-id']
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
+        indexes = [
+            models.Index(fields=['user', '-id'], name='favorite_user_id_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique favorite recipe for user')
@@ -155,6 +247,9 @@ class Cart(models.Model):
         ordering = ['-id']
         verbose_name = 'Корзина'
         verbose_name_plural = 'В корзине'
+        indexes = [
+            models.Index(fields=['user', '-id'], name='cart_user_id_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique cart user')
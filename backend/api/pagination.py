@@ -1,6 +1,135 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+from functools import partial
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from api.versions import bump_version, get_versions
+
+PAGINATION_PARAMS = ('page', 'limit', 'cursor', 'pagination')
+COUNT_VERSION_KEY = 'count_version'
+USER_COUNT_VERSION_KEY = 'count_version:{}'
+USER_COUNT_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def bump_count_version(user_id=None):
+    key = (COUNT_VERSION_KEY if user_id is None
+           else USER_COUNT_VERSION_KEY.format(user_id))
+    bump_version(key)
+
+
+def is_user_count(request, view):
+    if not request.user.is_authenticated:
+        return False
+    return (getattr(view, 'action', None)
+            in getattr(view, 'user_count_actions', ())
+            or any(param in request.query_params
+                   for param in USER_COUNT_PARAMS))
+
+
+def get_count_cache_key(request, view=None):
+    keys = [COUNT_VERSION_KEY]
+    user_id = None
+    if is_user_count(request, view):
+        user_id = request.user.pk
+        keys.append(USER_COUNT_VERSION_KEY.format(user_id))
+    params = sorted(
+        (key, sorted(values))
+        for key, values in request.query_params.lists()
+        if key not in PAGINATION_PARAMS
+    )
+    key = (f'{request.path}:{user_id}:{params}:'
+           f'{get_versions(keys)}')
+    return 'count:' + md5(key.encode()).hexdigest()
+
+
+def get_estimated_count(queryset):
+    if (not settings.PAGINATION_ESTIMATE_COUNTS
+            or connection.vendor != 'postgresql'
+            or queryset.query.where or queryset.query.distinct):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < settings.PAGINATION_ESTIMATE_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+def get_count(queryset, request, view=None):
+    count = get_estimated_count(queryset)
+    if count is not None:
+        return count
+    timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+    if not timeout:
+        return queryset.count()
+    return cache.get_or_set(
+        get_count_cache_key(request, view), queryset.count, timeout)
+
+
+class CountedPaginator(Paginator):
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return super().count
+
+
+class IdCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if settings.PAGINATION_COUNT_CACHE_TIMEOUT:
+            self.count = get_count(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = queryset.query.order_by
+        if ordering and all(isinstance(field, str) for field in ordering):
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    mode_query_param = 'pagination'
+    cursor_pagination_class = IdCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        self.django_paginator_class = partial(
+            CountedPaginator, count=get_count(queryset, request, view))
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
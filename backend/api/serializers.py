@@ -1,6 +1,8 @@
 from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
+from api.images import schedule_variants, thumbnail_url, variant_urls
 from api.models import Ingredient, IngredientAmount, Recipe, Tag, Cart, Favorite
 from users.models import Follow
 from users.serializers import CustomUserSerializer
@@ -30,9 +32,7 @@ class ReadRecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class CreateRecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         fields = ('id', 'amount',)
@@ -43,10 +43,7 @@ class CreateRecipeIngredientSerializer(serializers.ModelSerializer):
 class CreateRecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = CreateRecipeIngredientSerializer(
         many=True,
         write_only=True,
@@ -66,6 +63,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('author',)
 
+    @transaction.atomic
     def create(self, validated_data):
         current_user = self.context['request'].user
         tags = validated_data.pop('tags')
@@ -85,33 +83,75 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             )
         IngredientAmount.objects.bulk_create(ingredient_amounts, ignore_conflicts=True)
         recipe.tags.set(tags)
+        schedule_variants(recipe.image.name)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        recipe.tags.clear()
-        recipe.tags.set(tags)
-        recipe.ingredients.clear()
-        create_ingredients = [
-            IngredientAmount(
-                recipe=recipe,
-                ingredient=ingredient.get('id'),
-                amount=ingredient.get('amount'),
-            )
-            for ingredient in ingredients
-        ]
-        IngredientAmount.objects.bulk_create(create_ingredients)
-        return super().update(recipe, validated_data)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            self.update_tags(recipe, tags)
+        if ingredients is not None:
+            self.update_ingredients(recipe, ingredients)
+        if 'image' in validated_data:
+            validated_data['image_variants_ready'] = False
+            validated_data['image_hash'] = ''
+        recipe = super().update(recipe, validated_data)
+        if 'image' in validated_data:
+            schedule_variants(recipe.image.name)
+        return recipe
+
+    def update_tags(self, recipe, tags):
+        current = {tag.id for tag in recipe.tags.all()}
+        new = {tag.id for tag in tags}
+        if current - new:
+            recipe.tags.remove(*(current - new))
+        if new - current:
+            recipe.tags.add(*(new - current))
+
+    def update_ingredients(self, recipe, ingredients):
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredientamount_set.all()
+        }
+        create_ingredients = []
+        update_ingredients = []
+        for ingredient in ingredients:
+            item = current.pop(ingredient['id'].id, None)
+            if item is None:
+                create_ingredients.append(IngredientAmount(
+                    recipe=recipe,
+                    ingredient=ingredient['id'],
+                    amount=ingredient['amount'],
+                ))
+            elif item.amount != ingredient['amount']:
+                item.amount = ingredient['amount']
+                update_ingredients.append(item)
+        if current:
+            IngredientAmount.objects.filter(
+                id__in=[item.id for item in current.values()]).delete()
+        if update_ingredients:
+            IngredientAmount.objects.bulk_update(
+                update_ingredients, ['amount'])
+        if create_ingredients:
+            IngredientAmount.objects.bulk_create(create_ingredients)
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().with_user_flags(
+            self.context['request'].user).get(pk=instance.pk)
         return ReadRecipeSerializer(instance, context=self.context).data
 
     def validate_tags(self, tags):
         if not tags or len(tags) == 0:
             raise serializers.ValidationError(
                 'Рецепт должен содержать хотя бы один тег!')
-        return tags
+        found = Tag.objects.in_bulk(tags)
+        missing = sorted(set(tags) - found.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Теги не существуют: {missing}')
+        return [found[tag_id] for tag_id in dict.fromkeys(tags)]
 
     def validate_ingredients(self, value):
         ingredients = value
@@ -119,11 +159,19 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'ingredients': 'Нужен хотя бы один ингредиент!'
             })
-        ingredients_list = [item['id'].id for item in ingredients]
+        ingredients_list = [item['id'] for item in ingredients]
         if len(ingredients_list) != len(set(ingredients_list)):
             raise serializers.ValidationError({
                 'ingredients': 'Ингридиенты не могут повторяться!'
             })
+        found = Ingredient.objects.in_bulk(ingredients_list)
+        missing = sorted(set(ingredients_list) - found.keys())
+        if missing:
+            raise serializers.ValidationError({
+                'ingredients': f'Ингридиенты не существуют: {missing}'
+            })
+        for item in ingredients:
+            item['id'] = found[item['id']]
         return value
 
 
@@ -137,8 +185,11 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request:
             current_user = request.user
@@ -148,6 +199,8 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
             return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request:
             current_user = request.user
@@ -156,6 +209,17 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
                     user=current_user, recipe=obj.id).exists()
             return False
 
+    def get_image_variants(self, obj):
+        if not obj.image:
+            return {}
+        return variant_urls(obj.image.name, obj.image_variants_ready,
+                            self.context.get('request'))
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     class Meta:
         model = Recipe
         fields = (
@@ -165,6 +229,7 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
             'author',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
             'is_favorited',
@@ -177,6 +242,7 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
             'author',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
             'is_favorited',
@@ -185,7 +251,14 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
 
 
 class CropRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = serializers.SerializerMethodField()
+
+    def get_image(self, obj):
+        if not obj.image:
+            return None
+        url = thumbnail_url(obj.image.name, obj.image_hash)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
     class Meta:
         model = Recipe
@@ -209,17 +282,20 @@ class FollowSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=obj.user, author=obj.author
-        ).exists()
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj.author, 'limited_recipes'):
+            queryset = obj.author.limited_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            queryset = Recipe.objects.filter(author=obj.author)
+            if limit:
+                queryset = queryset[:int(limit)]
         return CropRecipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj.author).count()
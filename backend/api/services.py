@@ -0,0 +1,239 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from hashlib import md5
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.catalog import CATALOG_VERSION_KEY
+from api.images import variant_urls
+from api.models import IngredientAmount, Recipe
+from api.serializers import ReadRecipeSerializer
+from api.versions import get_version
+
+FONT_NAME = 'Slimamif'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'Slimamif.ttf')
+
+TITLE = 'Список ингредиентов'
+TITLE_FONT_SIZE = 24
+ROW_FONT_SIZE = 16
+ROW_HEIGHT = 25
+LEFT_MARGIN = 75
+TOP_MARGIN = 800
+BOTTOM_MARGIN = 50
+
+SHOPPING_LIST_KEY = 'shopping_list:{}'
+SHOPPING_LIST_PDF_KEY = 'shopping_list_pdf:{}'
+RECIPE_CARD_KEY = 'recipe_card:{}:{}:{}:{}'
+
+
+def register_fonts():
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def format_row(number, data):
+    return (f'<{number}> {data["ingredient__name"]} - {data["amount"]}, '
+            f'{data["ingredient__measurement_unit"]}')
+
+
+def render_shopping_list(ingredients):
+    buffer = BytesIO()
+    page = canvas.Canvas(buffer)
+    page.setFont(FONT_NAME, size=TITLE_FONT_SIZE)
+    page.drawString(200, TOP_MARGIN, TITLE)
+    page.setFont(FONT_NAME, size=ROW_FONT_SIZE)
+    height = TOP_MARGIN - 2 * ROW_HEIGHT
+    for i, data in enumerate(ingredients, 1):
+        if height < BOTTOM_MARGIN:
+            page.showPage()
+            page.setFont(FONT_NAME, size=ROW_FONT_SIZE)
+            height = TOP_MARGIN
+        page.drawString(LEFT_MARGIN, height, format_row(i, data))
+        height -= ROW_HEIGHT
+    page.showPage()
+    page.save()
+    buffer.seek(0)
+    return buffer
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_txt(ingredients):
+    yield f'{TITLE}\n\n'
+    for i, data in enumerate(ingredients, 1):
+        yield format_row(i, data) + '\n'
+
+
+def stream_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for data in ingredients:
+        yield writer.writerow((data['ingredient__name'],
+                               data['ingredient__measurement_unit'],
+                               data['amount']))
+
+
+def stream_json(ingredients):
+    yield '['
+    for i, data in enumerate(ingredients):
+        yield (',' if i else '') + json.dumps({
+            'name': data['ingredient__name'],
+            'measurement_unit': data['ingredient__measurement_unit'],
+            'amount': data['amount'],
+        }, ensure_ascii=False)
+    yield ']'
+
+
+SHOPPING_LIST_STREAMS = {
+    'txt': stream_txt,
+    'csv': stream_csv,
+    'json': stream_json,
+}
+
+
+def get_shopping_list(user):
+    key = SHOPPING_LIST_KEY.format(user.id)
+    shopping_list = cache.get(key)
+    if shopping_list is None:
+        shopping_list = list(IngredientAmount.objects.filter(
+            recipe__cart__user=user
+        ).values(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).annotate(
+            amount=Sum('amount')
+        ).order_by('ingredient__name'))
+        cache.set(key, shopping_list, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return shopping_list
+
+
+def get_shopping_list_pdf(user):
+    key = SHOPPING_LIST_PDF_KEY.format(user.id)
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = render_shopping_list(get_shopping_list(user)).getvalue()
+        cache.set(key, pdf, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return BytesIO(pdf)
+
+
+def invalidate_shopping_lists(user_ids):
+    cache.delete_many([
+        key.format(user_id)
+        for user_id in user_ids
+        for key in (SHOPPING_LIST_KEY, SHOPPING_LIST_PDF_KEY)
+    ])
+
+
+def get_recipe_card_keys(recipes, request):
+    version = get_version(CATALOG_VERSION_KEY)
+    host = md5(request.build_absolute_uri('/').encode()).hexdigest()[:8]
+    return {
+        recipe.pk: RECIPE_CARD_KEY.format(
+            recipe.pk, recipe.updated_at.timestamp(), version, host)
+        for recipe in recipes
+    }
+
+
+def serialize_recipe_cards(pks, request):
+    serializer = ReadRecipeSerializer(
+        Recipe.objects.with_related().with_user_flags(
+            AnonymousUser()).filter(pk__in=pks),
+        many=True,
+        context={'request': request},
+    )
+    return {card['id']: card for card in serializer.data}
+
+
+def build_recipe_cards(pks, request):
+    tags = defaultdict(list)
+    for item in Recipe.tags.through.objects.filter(
+            recipe_id__in=pks).order_by('-tag_id').values(
+            'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'):
+        tags[item['recipe_id']].append({
+            'id': item['tag__id'],
+            'name': item['tag__name'],
+            'color': item['tag__color'],
+            'slug': item['tag__slug'],
+        })
+    ingredients = defaultdict(list)
+    for item in IngredientAmount.objects.filter(recipe_id__in=pks).values(
+            'recipe_id', 'ingredient__id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'):
+        ingredients[item['recipe_id']].append({
+            'id': item['ingredient__id'],
+            'name': item['ingredient__name'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+            'amount': item['amount'],
+        })
+    cards = {}
+    for recipe in Recipe.objects.filter(pk__in=pks).values(
+            'id', 'name', 'image', 'text', 'cooking_time', 'author__email',
+            'author__id', 'author__username', 'author__first_name',
+            'author__last_name', 'image_variants_ready'):
+        image = recipe['image']
+        cards[recipe['id']] = {
+            'id': recipe['id'],
+            'tags': tags[recipe['id']],
+            'ingredients': ingredients[recipe['id']],
+            'author': {
+                'email': recipe['author__email'],
+                'id': recipe['author__id'],
+                'username': recipe['author__username'],
+                'first_name': recipe['author__first_name'],
+                'last_name': recipe['author__last_name'],
+                'is_subscribed': False,
+            },
+            'name': recipe['name'],
+            'image': (request.build_absolute_uri(default_storage.url(image))
+                      if image else None),
+            'image_variants': (
+                variant_urls(image, recipe['image_variants_ready'], request)
+                if image else {}),
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+        }
+    return cards
+
+
+def load_recipe_cards(pks, request):
+    if settings.RECIPE_LIST_VALUES_ENABLED:
+        return build_recipe_cards(pks, request)
+    return serialize_recipe_cards(pks, request)
+
+
+def get_recipe_cards(recipes, request):
+    cards = {}
+    if settings.RECIPE_CARD_CACHE_ENABLED:
+        keys = get_recipe_card_keys(recipes, request)
+        cached = cache.get_many(keys.values())
+        cards = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [recipe.pk for recipe in recipes if recipe.pk not in cards]
+    if missing:
+        fresh = load_recipe_cards(missing, request)
+        if settings.RECIPE_CARD_CACHE_ENABLED:
+            cache.set_many({keys[pk]: card for pk, card in fresh.items()},
+                           settings.RECIPE_CARD_CACHE_TIMEOUT)
+        cards.update(fresh)
+    result = []
+    for recipe in recipes:
+        card = dict(cards[recipe.pk])
+        card['author'] = {**card['author'],
+                          'is_subscribed': recipe.author_is_subscribed}
+        card['is_favorited'] = recipe.is_favorited
+        card['is_in_shopping_cart'] = recipe.is_in_shopping_cart
+        result.append(card)
+    return result
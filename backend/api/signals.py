@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.catalog import bump_catalog_version
+from api.filters import TAG_SLUGS_KEY
+from api.models import (Cart, Favorite, Ingredient, IngredientAmount, Recipe,
+                        Tag)
+from api.pagination import bump_count_version
+from api.services import invalidate_shopping_lists
+from users.authentication import invalidate_tokens, invalidate_user_tokens
+from users.models import Follow
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def cart_changed(sender, instance, **kwargs):
+    invalidate_shopping_lists([instance.user_id])
+
+
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def ingredient_amount_changed(sender, instance, **kwargs):
+    invalidate_shopping_lists(Cart.objects.filter(
+        recipe_id=instance.recipe_id).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_shopping_lists(Cart.objects.filter(
+            recipe=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_shopping_lists(Cart.objects.filter(
+            recipe__ingredients=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    cache.delete(TAG_SLUGS_KEY)
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def list_item_created(sender, created, **kwargs):
+    if created:
+        bump_count_version()
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def list_item_deleted(sender, **kwargs):
+    bump_count_version()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def user_list_changed(sender, instance, **kwargs):
+    bump_count_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields != frozenset(['last_login']):
+        Recipe.objects.filter(author=instance).update(
+            updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields != frozenset(['last_login']):
+        invalidate_user_tokens(instance.pk)
@@ -0,0 +1,336 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.middleware import QueryBudgetExceeded
+from api.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                        Recipe, Tag)
+from api.renderers import FastJSONRenderer, orjson
+from api.services import build_recipe_cards, serialize_recipe_cards
+from api.views import RecipeViewSet
+from users.models import Follow
+
+User = get_user_model()
+
+RECIPE_LIST_MODES = {
+    'serializer': {'RECIPE_CARD_CACHE_ENABLED': False,
+                   'RECIPE_LIST_VALUES_ENABLED': False},
+    'values': {'RECIPE_CARD_CACHE_ENABLED': False,
+               'RECIPE_LIST_VALUES_ENABLED': True},
+    'card_cache': {'RECIPE_CARD_CACHE_ENABLED': True,
+                   'RECIPE_LIST_VALUES_ENABLED': True},
+}
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password='password', first_name=username, last_name=username)
+
+
+def create_recipes(author, count, ingredients, tags):
+    recipes = Recipe.objects.bulk_create([
+        Recipe(author=author, name=f'Рецепт {i}', image='recipes/test.jpg',
+               text='Описание', cooking_time=10)
+        for i in range(count)
+    ])
+    IngredientAmount.objects.bulk_create([
+        IngredientAmount(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes for ingredient in ingredients
+    ])
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes for tag in tags
+    ])
+    return recipes
+
+
+class RecipeListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.token = Token.objects.create(user=cls.user)
+        tags = Tag.objects.bulk_create([
+            Tag(name=name, color=color, slug=name)
+            for name, color in (('breakfast', Tag.BLUE),
+                                ('dinner', Tag.GREEN))
+        ])
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(10)
+        ])
+        for i in range(3):
+            create_recipes(create_user(f'author{i}'), 10,
+                           ingredients[:3 + i * 3], tags[:i % 2 + 1])
+
+    def setUp(self):
+        self.anon_client = APIClient()
+        self.auth_client = APIClient()
+        self.auth_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_list_queries(self, client, num):
+        for limit in (5, 25):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(num):
+                    response = client.get('/api/recipes/', {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        expected = {'serializer': 4, 'values': 5, 'card_cache': 5}
+        for mode, overrides in RECIPE_LIST_MODES.items():
+            with self.subTest(mode=mode), override_settings(**overrides):
+                self.assert_list_queries(self.anon_client, expected[mode])
+                self.assert_list_queries(
+                    self.auth_client, expected[mode] + 1)
+
+
+class RecipeCardOutputTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('golden')
+        cls.token = Token.objects.create(user=cls.user)
+        author = create_user('author')
+        tags = Tag.objects.bulk_create([
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in (('Завтрак', Tag.BLUE, 'breakfast'),
+                                      ('Ужин', Tag.PURPLE, 'dinner'))
+        ])
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент "{i}"\u2028', measurement_unit='шт.')
+            for i in range(4)
+        ])
+        recipes = (create_recipes(author, 3, ingredients, tags)
+                   + create_recipes(cls.user, 2, ingredients[:1], tags[1:]))
+        Recipe.objects.filter(pk=recipes[0].pk).update(
+            image_variants_ready=True, name='Пирог\u2029 <b>&</b>')
+        Recipe.objects.filter(pk=recipes[1].pk).update(image='')
+        Favorite.objects.create(user=cls.user, recipe=recipes[0])
+        Cart.objects.create(user=cls.user, recipe=recipes[2])
+        Follow.objects.create(user=cls.user, author=author)
+        cls.pks = [recipe.pk for recipe in recipes]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_values_cards_match_serializer(self):
+        request = RequestFactory().get('/api/recipes/')
+        expected = serialize_recipe_cards(self.pks, request)
+        actual = build_recipe_cards(self.pks, request)
+        renderer = JSONRenderer()
+        for pk in self.pks:
+            with self.subTest(pk=pk):
+                self.assertEqual(renderer.render(actual[pk]),
+                                 renderer.render(expected[pk]))
+
+    def test_list_paths_are_byte_identical(self):
+        auth_client = APIClient()
+        auth_client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for client in (APIClient(), auth_client):
+            contents = {}
+            for mode, overrides in RECIPE_LIST_MODES.items():
+                with override_settings(**overrides):
+                    contents[mode] = client.get(
+                        '/api/recipes/', {'limit': 10}).content
+            with self.subTest(auth=client is auth_client):
+                self.assertEqual(contents['values'], contents['serializer'])
+                self.assertEqual(
+                    contents['card_cache'], contents['serializer'])
+
+    @skipIf(orjson is None, 'orjson не установлен')
+    def test_fast_renderer_matches_json_renderer(self):
+        request = RequestFactory().get('/api/recipes/')
+        page = list(serialize_recipe_cards(self.pks, request).values())
+        now = timezone.now().replace(microsecond=123456)
+        page.append({'created': now, 'naive': now.replace(tzinfo=None),
+                     'date': now.date(), 'time': now.time()})
+        self.assertEqual(FastJSONRenderer().render(page),
+                         JSONRenderer().render(page))
+
+
+class RecipeUpdateWritesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('cook')
+        cls.token = Token.objects.create(user=cls.author)
+        cls.tags = Tag.objects.bulk_create([
+            Tag(name='lunch', color=Tag.ORANGE, slug='lunch')])
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Продукт {i}', measurement_unit='г')
+            for i in range(6)
+        ])
+        cls.recipe = create_recipes(
+            cls.author, 1, cls.ingredients[:5], cls.tags)[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def count_writes(self, ingredients, text='Описание'):
+        data = {
+            'name': self.recipe.name,
+            'text': text,
+            'cooking_time': self.recipe.cooking_time,
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return sum(
+            query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            for query in queries.captured_queries
+        )
+
+    def test_text_edit_writes_only_recipe(self):
+        ingredients = [(ingredient, 1) for ingredient in self.ingredients[:5]]
+        self.assertEqual(self.count_writes(ingredients, text='Новое'), 1)
+
+    def test_changed_amount_updates_one_row(self):
+        ingredients = [(ingredient, 1) for ingredient in self.ingredients[:5]]
+        ingredients[0] = (self.ingredients[0], 2)
+        self.assertEqual(self.count_writes(ingredients), 2)
+        self.assertEqual(
+            IngredientAmount.objects.get(
+                recipe=self.recipe, ingredient=self.ingredients[0]).amount,
+            2)
+
+    def test_swapped_ingredient_deletes_and_inserts(self):
+        ingredients = [(ingredient, 1) for ingredient in self.ingredients[1:]]
+        self.assertEqual(self.count_writes(ingredients), 3)
+        self.assertEqual(
+            set(self.recipe.ingredients.all()), set(self.ingredients[1:]))
+
+
+@override_settings(
+    MIDDLEWARE=['api.middleware.RequestMetricsMiddleware',
+                *settings.MIDDLEWARE],
+    QUERY_BUDGET_RAISE=True)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('budget')
+        cls.token = Token.objects.create(user=cls.user)
+        author = create_user('author')
+        tags = Tag.objects.bulk_create([
+            Tag(name='lunch', color=Tag.ORANGE, slug='lunch')])
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Продукт {i}', measurement_unit='г')
+            for i in range(3)
+        ])
+        cls.recipes = create_recipes(author, 3, ingredients, tags)
+        cls.tag = tags[0]
+        cls.ingredient = ingredients[0]
+        cls.author = author
+        Follow.objects.create(user=cls.user, author=author)
+        Cart.objects.create(user=cls.user, recipe=cls.recipes[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_budgeted_endpoints_fit_budget(self):
+        recipe = self.recipes[1]
+        requests = (
+            ('get', '/api/recipes/'),
+            ('get', f'/api/recipes/{recipe.pk}/'),
+            ('post', f'/api/recipes/{recipe.pk}/favorite/'),
+            ('delete', f'/api/recipes/{recipe.pk}/favorite/'),
+            ('post', f'/api/recipes/{recipe.pk}/shopping_cart/'),
+            ('get', '/api/recipes/download_shopping_cart/'),
+            ('get', '/api/tags/'),
+            ('get', f'/api/tags/{self.tag.pk}/'),
+            ('get', '/api/ingredients/'),
+            ('get', f'/api/ingredients/{self.ingredient.pk}/'),
+            ('get', '/api/users/me/'),
+            ('get', '/api/users/subscriptions/'),
+            ('delete', f'/api/users/{self.author.pk}/subscribe/'),
+            ('post', f'/api/users/{self.author.pk}/subscribe/'),
+        )
+        for method, url in requests:
+            with self.subTest(method=method, url=url), self.assertLogs(
+                    'api.metrics', 'INFO'):
+                response = getattr(self.client, method)(url)
+                self.assertLess(response.status_code, 300)
+                self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_exceeded_budget_raises(self):
+        with mock.patch.dict(RecipeViewSet.query_budgets, {'list': 1}):
+            with self.assertLogs('api.metrics', 'WARNING'), \
+                    self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/recipes/')
+
+
+@skipIf(connection.vendor == 'sqlite',
+        'SQLite блокирует таблицу при параллельной записи')
+class ConcurrentToggleTest(TransactionTestCase):
+    workers = 8
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('clicker')
+        self.token = Token.objects.create(user=self.user)
+        self.author = create_user('author')
+        self.recipe = create_recipes(self.author, 1, [], [])[0]
+
+    def send_concurrently(self, method, url):
+        barrier = Barrier(self.workers)
+
+        def send(_):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+            barrier.wait()
+            try:
+                return getattr(client, method)(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            return sorted(executor.map(send, range(self.workers)))
+
+    def assert_toggled(self, statuses, success):
+        self.assertEqual(statuses.count(success), 1)
+        self.assertEqual(statuses.count(400), self.workers - 1)
+
+    def assert_counter(self, model, field, expected):
+        self.recipe.refresh_from_db()
+        self.assertEqual(model.objects.count(), expected)
+        self.assertEqual(getattr(self.recipe, field), expected)
+
+    def test_recipe_lists(self):
+        for action, model, field in (
+                ('favorite', Favorite, 'favorites_count'),
+                ('shopping_cart', Cart, 'in_carts_count')):
+            with self.subTest(action=action):
+                url = f'/api/recipes/{self.recipe.pk}/{action}/'
+                self.assert_toggled(self.send_concurrently('post', url), 201)
+                self.assert_counter(model, field, 1)
+                self.assert_toggled(
+                    self.send_concurrently('delete', url), 204)
+                self.assert_counter(model, field, 0)
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        self.assert_toggled(self.send_concurrently('post', url), 201)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assert_toggled(self.send_concurrently('delete', url), 204)
+        self.assertEqual(Follow.objects.count(), 0)
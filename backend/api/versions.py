@@ -0,0 +1,24 @@
+import time
+
+from django.core.cache import cache
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def get_version(key):
+    return get_versions([key])[0]
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
@@ -1,46 +1,97 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
 
+from api.catalog import ingredient_catalog
+from api.etags import catalog_etag, recipe_etag, recipe_last_modified
 from api.filters import AuthorAndTagFilter, IngredientSearchFilter
-from api.models import (Cart, Favorite, Ingredient, IngredientAmount, Recipe,
-                        Tag)
+from api.models import Cart, Favorite, Ingredient, Recipe, Tag
 from api.pagination import LimitPageNumberPagination
 from api.permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
+from api.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from api.serializers import (CropRecipeSerializer, IngredientSerializer,
                               TagSerializer, CreateRecipeSerializer,
                              ReadRecipeSerializer,)
+from api.services import (SHOPPING_LIST_STREAMS, get_recipe_cards,
+                          get_shopping_list, get_shopping_list_pdf)
 
 
+@method_decorator(condition(etag_func=catalog_etag), name='list')
+@method_decorator(condition(etag_func=catalog_etag), name='retrieve')
 class TagsViewSet(ReadOnlyModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
+    query_budgets = {'list': 2, 'retrieve': 2}
     pagination_class = None
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
+@method_decorator(condition(etag_func=catalog_etag), name='list')
+@method_decorator(condition(etag_func=catalog_etag), name='retrieve')
 class IngredientsViewSet(ReadOnlyModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
+    query_budgets = {'list': 3, 'retrieve': 2}
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(
+            IngredientSearchFilter.search_param, '').strip()
+        if name and settings.INGREDIENT_CATALOG_ENABLED:
+            return Response(ingredient_catalog.search(name))
+        return super().list(request, *args, **kwargs)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = CreateRecipeSerializer
     pagination_class = LimitPageNumberPagination
-    filter_class = AuthorAndTagFilter
+    filterset_class = AuthorAndTagFilter
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    query_budgets = {
+        'list': 6,
+        'retrieve': 6,
+        'create': 12,
+        'partial_update': 16,
+        'favorite': 6,
+        'shopping_cart': 6,
+        'download_shopping_cart': 4,
+    }
+    counter_fields = {
+        Favorite: 'favorites_count',
+        Cart: 'in_carts_count',
+    }
+
+    def get_queryset(self):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if not (settings.RECIPE_CARD_CACHE_ENABLED
+                or settings.RECIPE_LIST_VALUES_ENABLED):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(
+            Recipe.objects.with_user_flags(request.user).only(
+                'id', 'author', 'updated_at', *self.counter_fields.values()))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(get_recipe_cards(page, request))
+
+    @method_decorator(condition(etag_func=recipe_etag,
+                                last_modified_func=recipe_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH'):
@@ -68,51 +119,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return None
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[PDFRenderer, PlainTextRenderer, CSVRenderer,
+                              JSONRenderer])
     def download_shopping_cart(self, request):
-        final_list = IngredientAmount.objects.filter(
-            recipe__cart__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            amount=Sum('amount')
-        ).order_by('ingredient__name')
-        pdfmetrics.registerFont(
-            TTFont('Slimamif', 'Slimamif.ttf', 'UTF-8'))
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = ('attachment; '
-                                           'filename="shopping_list.pdf"')
-        page = canvas.Canvas(response)
-        page.setFont('Slimamif', size=24)
-        page.drawString(200, 800, 'Список ингредиентов')
-        page.setFont('Slimamif', size=16)
-        height = 750
-        for i, data in enumerate(final_list, 1):
-            name = data['ingredient__name']
-            amount = data['amount']
-            measurement_unit = data['ingredient__measurement_unit']
-            page.drawString(75, height, (f'<{i}> {name} - {amount}, '
-                                         f'{measurement_unit}'))
-            height -= 25
-        page.showPage()
-        page.save()
+        renderer = request.accepted_renderer
+        filename = f'shopping_list.{renderer.format}'
+        if renderer.format == 'pdf':
+            return FileResponse(get_shopping_list_pdf(request.user),
+                                as_attachment=True,
+                                filename=filename,
+                                content_type=renderer.media_type)
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_STREAMS[renderer.format](
+                get_shopping_list(request.user)),
+            content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
     def add_obj(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
+        recipe = get_object_or_404(Recipe, id=pk)
+        try:
+            with transaction.atomic():
+                model.objects.create(user=user, recipe=recipe)
+                self.update_counter(model, pk, 1)
+        except IntegrityError:
             return Response({
                 'errors': 'Рецепт уже добавлен в список'
             }, status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
         serializer = CropRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_obj(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=user, recipe__id=pk).delete()
+            if deleted:
+                self.update_counter(model, pk, -deleted)
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({
             'errors': 'Рецепт уже удален'
         }, status=status.HTTP_400_BAD_REQUEST)
+
+    def update_counter(self, model, pk, delta):
+        field = self.counter_fields[model]
+        Recipe.objects.filter(id=pk).update(
+            **{field: Greatest(F(field) + delta, 0)})
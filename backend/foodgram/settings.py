@@ -9,7 +9,7 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']
 
 INSTALLED_APPS = [
-    'api',
+    'api.apps.ApiConfig',
     'users',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -65,6 +65,90 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT', default='5432')
     }
 }
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+SHOPPING_LIST_CACHE_TIMEOUT = int(os.getenv(
+    'SHOPPING_LIST_CACHE_TIMEOUT', default=60 * 60 * 24))
+
+TAG_SLUGS_CACHE_TIMEOUT = int(os.getenv(
+    'TAG_SLUGS_CACHE_TIMEOUT', default=60 * 5))
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv(
+    'PAGINATION_COUNT_CACHE_TIMEOUT', default=60))
+
+PAGINATION_ESTIMATE_COUNTS = os.getenv(
+    'PAGINATION_ESTIMATE_COUNTS', default='False') == 'True'
+
+PAGINATION_ESTIMATE_THRESHOLD = int(os.getenv(
+    'PAGINATION_ESTIMATE_THRESHOLD', default=10000))
+
+INGREDIENT_CATALOG_ENABLED = os.getenv(
+    'INGREDIENT_CATALOG_ENABLED', default='True') == 'True'
+
+INGREDIENT_CATALOG_MAX_AGE = int(os.getenv(
+    'INGREDIENT_CATALOG_MAX_AGE', default=60 * 5))
+
+RECIPE_CARD_CACHE_ENABLED = os.getenv(
+    'RECIPE_CARD_CACHE_ENABLED', default='True') == 'True'
+
+RECIPE_CARD_CACHE_TIMEOUT = int(os.getenv(
+    'RECIPE_CARD_CACHE_TIMEOUT', default=60 * 60 * 24))
+
+RECIPE_LIST_VALUES_ENABLED = os.getenv(
+    'RECIPE_LIST_VALUES_ENABLED', default='True') == 'True'
+
+FAST_JSON_ENABLED = os.getenv('FAST_JSON_ENABLED', default='False') == 'True'
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (320, 320),
+    'detail': (1280, 1280),
+}
+
+RECIPE_THUMBNAIL_SIZE = (160, 160)
+
+IMAGE_VARIANT_QUALITY = 80
+
+IMAGE_PROCESSING_BACKEND = os.getenv(
+    'IMAGE_PROCESSING_BACKEND', default='api.images.ThreadPoolBackend')
+
+IMAGE_PROCESSING_WORKERS = int(os.getenv(
+    'IMAGE_PROCESSING_WORKERS', default=2))
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv(
+    'AUTH_TOKEN_CACHE_TIMEOUT', default=60 * 5))
+
+REQUEST_METRICS_ENABLED = os.getenv(
+    'REQUEST_METRICS_ENABLED', default='False') == 'True'
+
+QUERY_BUDGET_RAISE = os.getenv(
+    'QUERY_BUDGET_RAISE', default='False') == 'True'
+
+if REQUEST_METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'api.middleware.RequestMetricsMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -101,8 +185,19 @@ CORS_URLS_REGEX = r'^/api/.*$'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer' if FAST_JSON_ENABLED
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser' if FAST_JSON_ENABLED
+        else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PERMISSION_CLASSES': [
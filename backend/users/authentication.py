@@ -0,0 +1,36 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+AUTH_TOKEN_KEY = 'auth_token:{}'
+
+
+def get_token_cache_key(key):
+    return AUTH_TOKEN_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def invalidate_tokens(keys):
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            cache.set(cache_key, cached, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.')
+        return user, token
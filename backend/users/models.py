@@ -22,6 +22,9 @@ class Follow(models.Model):
         ordering = ['-id']
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(fields=['user', '-id'], name='follow_user_id_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
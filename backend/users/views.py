@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Prefetch, prefetch_related_objects
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
@@ -6,6 +8,7 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from api.models import Recipe
 from api.pagination import LimitPageNumberPagination
 from api.serializers import FollowSerializer
 from users.models import Follow
@@ -15,6 +18,13 @@ User = get_user_model()
 
 class CustomUserViewSet(UserViewSet):
     pagination_class = LimitPageNumberPagination
+    query_budgets = {
+        'subscriptions': 5,
+        'subscribe': 6,
+        'del_subscribe': 5,
+        'me': 2,
+    }
+    user_count_actions = ('subscriptions',)
 
     @action(detail=True, permission_classes=[IsAuthenticated], methods=['post'])
     def subscribe(self, request, id=None):
@@ -25,12 +35,14 @@ class CustomUserViewSet(UserViewSet):
             return Response({
                 'errors': 'Вы не можете подписываться на самого себя'
             }, status=status.HTTP_400_BAD_REQUEST)
-        if Follow.objects.filter(user=user, author=author).exists():
+        try:
+            with transaction.atomic():
+                follow = Follow.objects.create(user=user, author=author)
+        except IntegrityError:
             return Response({
                 'errors': 'Вы уже подписаны на данного пользователя'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        follow = Follow.objects.create(user=user, author=author)
         serializer = FollowSerializer(
             follow, context={'request': request}
         )
@@ -44,9 +56,8 @@ class CustomUserViewSet(UserViewSet):
             return Response({
                 'errors': 'Вы не можете отписываться от самого себя'
             }, status=status.HTTP_400_BAD_REQUEST)
-        follow = Follow.objects.filter(user=user, author=author)
-        if follow.exists():
-            follow.delete()
+        deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response({
@@ -56,11 +67,22 @@ class CustomUserViewSet(UserViewSet):
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = request.user
-        queryset = Follow.objects.filter(user=user)
+        queryset = Follow.objects.filter(user=user).select_related(
+            'author').annotate(
+            recipes_count=Count('author__recipes')).order_by('-id')
         pages = self.paginate_queryset(queryset)
+        self.prefetch_recipes(pages, request.GET.get('recipes_limit'))
         serializer = FollowSerializer(
             pages,
             many=True,
             context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
+
+    def prefetch_recipes(self, follows, limit=None):
+        recipes = Recipe.objects.filter(
+            author__in=[follow.author_id for follow in follows])
+        if limit:
+            recipes = recipes.limit_per_author(int(limit))
+        prefetch_related_objects(follows, Prefetch(
+            'author__recipes', queryset=recipes, to_attr='limited_recipes'))